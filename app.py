@@ -1,14 +1,43 @@
+import os
+if os.getenv("USE_GEVENT"):
+    # Patch blocking I/O before anything else imports socket/ssl
+    from gevent import monkey
+    monkey.patch_all()
+
 from flask import Flask, request, jsonify
+from flask.json.provider import JSONProvider
+import orjson
 import openai
-import os
-from typing import Dict, Any
+import httpx
+import time
+import asyncio
+import threading
+import hashlib
+import re
+from typing import Dict, Any, List, Iterator, Optional, Tuple, Callable
+from functools import partial
 import json
 from dotenv import load_dotenv
 load_dotenv()
 from vapi import Vapi
+from vapi.core.api_error import ApiError as VapiApiError
 from flask_cors import CORS
+from cachetools import TTLCache
+from pydantic import BaseModel, ConfigDict, ValidationError
+import tiktoken
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_random_exponential
+import batch_jobs
+
+class OrjsonProvider(JSONProvider):
+    """Serialize API responses with orjson instead of the stdlib encoder"""
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        return orjson.loads(s)
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
 
 # Set your OpenAI API key
@@ -17,36 +46,216 @@ openai.api_key = os.getenv('OPENAI_API_KEY')
 # Vapi configuration
 VAPI_TOKEN = os.getenv('VAPI_TOKEN')
 
-vapi_client = Vapi(token=VAPI_TOKEN)
-
-class InterviewAnalyzer:
-    def __init__(self):
-        self.evaluation_criteria = [
-            "Problem structuring and framework development",
-            "Quantitative analysis and comfort with numbers", 
-            "Business judgment and practical insights",
-            "Communication clarity and logical flow",
-            "Creativity in solution development"
-        ]
-    
-    def get_transcript_from_vapi(self, call_id: str) -> str:
-        """
-        Fetch transcript from Vapi using call ID
-        """
+# One persistent HTTP/2 connection pool shared by the OpenAI and Vapi
+# clients, so TCP+TLS connections stay warm between requests instead of
+# being set up again on every cold call
+shared_http = httpx.Client(
+    http2=True,
+    timeout=30.0,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+)
+# The OpenAI client would otherwise inherit the pool's 30s timeout, which
+# long completions and transcript summaries can exceed. Retries are handled
+# by the tenacity policies below, not by the SDK
+OPENAI_TIMEOUT = httpx.Timeout(600, connect=10)
+openai_client = openai.OpenAI(
+    api_key=openai.api_key,
+    http_client=shared_http,
+    timeout=OPENAI_TIMEOUT,
+    max_retries=0
+)
+vapi_client = Vapi(token=VAPI_TOKEN, httpx_client=shared_http)
+
+# Bounded retries with exponential backoff and jitter for transient
+# OpenAI/Vapi failures (rate limits, 5xx, network errors)
+RETRY_ATTEMPTS = 6
+RETRY_MAX_WAIT = 30
+_backoff = wait_random_exponential(multiplier=1, max=RETRY_MAX_WAIT)
+
+def _is_transient_openai_error(e: BaseException) -> bool:
+    return isinstance(e, (openai.RateLimitError, openai.APIConnectionError,
+                          openai.InternalServerError, httpx.TimeoutException))
+
+def _is_transient_vapi_error(e: BaseException) -> bool:
+    if isinstance(e, VapiApiError):
+        return e.status_code == 429 or (e.status_code or 0) >= 500
+    return isinstance(e, httpx.TransportError)
+
+def _retry_wait(retry_state) -> float:
+    """Honor Retry-After (capped at RETRY_MAX_WAIT), otherwise back off with jitter"""
+    e = retry_state.outcome.exception()
+    response = getattr(e, 'response', None)
+    headers = response.headers if response is not None else getattr(e, 'headers', None)
+    if headers and headers.get('retry-after'):
         try:
-            call_details = vapi_client.calls.get(id=call_id)
-            transcript = call_details.artifact.transcript
-            return transcript
-        except Exception as e:
-            raise Exception(f"Failed to fetch transcript from Vapi: {str(e)}")
-    
-    def analyze_transcript(self, transcript: str) -> Dict[str, Any]:
-        """
-        Analyze interview transcript using OpenAI API
-        """
+            return min(float(headers['retry-after']), RETRY_MAX_WAIT)
+        except ValueError:
+            pass
+    return _backoff(retry_state)
+
+def _log_retry(retry_state):
+    app.logger.warning(
+        "Retrying %s (attempt %s of %s) after error: %s",
+        retry_state.fn.__name__, retry_state.attempt_number, RETRY_ATTEMPTS,
+        retry_state.outcome.exception()
+    )
+
+def _retrying(is_transient):
+    return retry(
+        wait=_retry_wait,
+        stop=stop_after_attempt(RETRY_ATTEMPTS),
+        retry=retry_if_exception(is_transient),
+        before_sleep=_log_retry,
+        reraise=True
+    )
+
+@_retrying(_is_transient_openai_error)
+def _create_completion(**params):
+    return openai_client.chat.completions.create(**params)
 
+@_retrying(_is_transient_openai_error)
+async def _acreate_completion(client: openai.AsyncOpenAI, **params):
+    return await client.chat.completions.create(**params)
 
-        sys_prompt = """You are a highly experienced interview evaluator who has assessed over 1,000 business case interviews across consulting, tech, and private equity. You have deep expertise in identifying candidate behaviors and competencies that correlate with success at top firms (e.g., MBB, FAANG). Your task is to provide an in-depth, constructive, and structured evaluation of the candidate’s performance.
+@_retrying(_is_transient_vapi_error)
+def _get_vapi_call(call_id: str):
+    # Disable the SDK's own retries so tenacity is the only retry layer
+    return vapi_client.calls.get(id=call_id, request_options={"max_retries": 0})
+
+# Transcripts of ended calls never change, so keep recently fetched ones
+TRANSCRIPT_CACHE_SIZE = int(os.getenv('TRANSCRIPT_CACHE_SIZE', '2048'))
+TRANSCRIPT_CACHE_TTL = int(os.getenv('TRANSCRIPT_CACHE_TTL', '3600'))
+_transcript_cache = TTLCache(maxsize=TRANSCRIPT_CACHE_SIZE, ttl=TRANSCRIPT_CACHE_TTL)
+_transcript_cache_lock = threading.Lock()
+
+def clear_cache():
+    """Drop all cached transcripts"""
+    with _transcript_cache_lock:
+        _transcript_cache.clear()
+
+# Analysis results keyed by transcript hash. Redis (REDIS_URL) is shared
+# between workers; otherwise fall back to a local disk cache
+ANALYSIS_CACHE_TTL = int(os.getenv('ANALYSIS_CACHE_TTL', '86400'))
+REDIS_URL = os.getenv('REDIS_URL')
+
+if REDIS_URL:
+    import redis
+    _redis_client = redis.Redis.from_url(REDIS_URL)
+
+    def _get_cached_analysis(key: str):
+        raw = _redis_client.get(key)
+        return json.loads(raw) if raw else None
+
+    def _set_cached_analysis(key: str, analysis_result: Dict[str, Any]):
+        _redis_client.setex(key, ANALYSIS_CACHE_TTL, json.dumps(analysis_result))
+else:
+    import diskcache
+    _analysis_cache = diskcache.Cache(os.getenv('ANALYSIS_CACHE_DIR', './.cache/analysis'))
+
+    def _get_cached_analysis(key: str):
+        return _analysis_cache.get(key)
+
+    def _set_cached_analysis(key: str, analysis_result: Dict[str, Any]):
+        _analysis_cache.set(key, analysis_result, expire=ANALYSIS_CACHE_TTL)
+
+def _analysis_cache_key(transcript: str, model: str) -> str:
+    digest = hashlib.blake2b(transcript.encode(), digest_size=16).hexdigest()
+    return f"analysis:{model}:{digest}"
+
+# Concurrency limit for bulk analysis and process-wide OpenAI rate limits
+MAX_CONCURRENT_REQUESTS = int(os.getenv('MAX_CONCURRENT_REQUESTS', '8'))
+MAX_REQUESTS_PER_MINUTE = float(os.getenv('MAX_REQUESTS_PER_MINUTE', '500'))
+MAX_TOKENS_PER_MINUTE = float(os.getenv('MAX_TOKENS_PER_MINUTE', '200000'))
+
+class RateLimiter:
+    """
+    Thread-safe token-bucket limiter for OpenAI requests and tokens per
+    minute, usable from both sync and async code
+    """
+    def __init__(self, max_requests_per_minute: float, max_tokens_per_minute: float):
+        self.max_requests_per_minute = max_requests_per_minute
+        self.max_tokens_per_minute = max_tokens_per_minute
+        self.available_requests = max_requests_per_minute
+        self.available_tokens = max_tokens_per_minute
+        self.last_update = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.last_update
+        self.available_requests = min(
+            self.max_requests_per_minute,
+            self.available_requests + self.max_requests_per_minute * elapsed / 60
+        )
+        self.available_tokens = min(
+            self.max_tokens_per_minute,
+            self.available_tokens + self.max_tokens_per_minute * elapsed / 60
+        )
+        self.last_update = now
+
+    def _try_acquire(self, tokens: int) -> bool:
+        tokens = min(tokens, self.max_tokens_per_minute)
+        with self._lock:
+            self._refill()
+            if self.available_requests >= 1 and self.available_tokens >= tokens:
+                self.available_requests -= 1
+                self.available_tokens -= tokens
+                return True
+            return False
+
+    def wait(self, tokens: int):
+        """Block until capacity for one request of `tokens` tokens is available"""
+        while not self._try_acquire(tokens):
+            time.sleep(0.1)
+
+    async def acquire(self, tokens: int):
+        """Wait until capacity for one request of `tokens` tokens is available"""
+        while not self._try_acquire(tokens):
+            await asyncio.sleep(0.1)
+
+# Shared by every analysis in the process so concurrent batches and the
+# single-call routes draw from one budget
+_rate_limiter = RateLimiter(MAX_REQUESTS_PER_MINUTE, MAX_TOKENS_PER_MINUTE)
+
+class CriterionFeedback(BaseModel):
+    model_config = ConfigDict(extra='forbid')
+
+    score: int
+    feedback: str
+    strengths: str
+    improvements: str
+
+class DetailedFeedback(BaseModel):
+    model_config = ConfigDict(extra='forbid')
+
+    problem_structuring: CriterionFeedback
+    quantitative_analysis: CriterionFeedback
+    business_judgment: CriterionFeedback
+    communication_clarity: CriterionFeedback
+    creativity: CriterionFeedback
+
+class InterviewAnalysis(BaseModel):
+    model_config = ConfigDict(extra='forbid')
+
+    overall_score: float
+    detailed_feedback: DetailedFeedback
+    summary: str
+    red_flags: Optional[str]
+
+# Structured outputs: the model is constrained to this schema, so the
+# prompt does not need to spell out the JSON structure
+_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "InterviewAnalysis",
+        "strict": True,
+        "schema": InterviewAnalysis.model_json_schema()
+    }
+}
+
+# Static prompt text. Kept byte-identical and sent first so OpenAI's
+# automatic prompt caching can reuse it across requests
+_SYS_PROMPT = """You are a highly experienced interview evaluator who has assessed over 1,000 business case interviews across consulting, tech, and private equity. You have deep expertise in identifying candidate behaviors and competencies that correlate with success at top firms (e.g., MBB, FAANG). Your task is to provide an in-depth, constructive, and structured evaluation of the candidate’s performance.
 
     Analyze the following interview transcript and evaluate the candidate across the following five parameters:
 
@@ -69,82 +278,447 @@ class InterviewAnalyzer:
     Also include:
     - An `"overall_score"` (average of the five individual scores)
     - A `"summary"` that synthesizes the candidate’s performance across all parameters, clearly stating whether you would recommend moving forward (yes/no/maybe)
-    - A `"red_flags"` field (optional) to highlight any major concerns such as unethical thinking, communication breakdowns, or critical analytical errors
-
-    Please format your response as a JSON object with the following structure:
-        {{
-            "overall_score": <average score>,
-            "detailed_feedback": {{
-                "problem_structuring": {{
-                    "score": <score>,
-                    "feedback": "<detailed feedback>",
-                    "strengths": "<strengths>",
-                    "improvements": "<areas for improvement>"
-                }},
-                "quantitative_analysis": {{
-                    "score": <score>,
-                    "feedback": "<detailed feedback>",
-                    "strengths": "<strengths>",
-                    "improvements": "<areas for improvement>"
-                }},
-                "business_judgment": {{
-                    "score": <score>,
-                    "feedback": "<detailed feedback>",
-                    "strengths": "<strengths>",
-                    "improvements": "<areas for improvement>"
-                }},
-                "communication_clarity": {{
-                    "score": <score>,
-                    "feedback": "<detailed feedback>",
-                    "strengths": "<strengths>",
-                    "improvements": "<areas for improvement>"
-                }},
-                "creativity": {{
-                    "score": <score>,
-                    "feedback": "<detailed feedback>",
-                    "strengths": "<strengths>",
-                    "improvements": "<areas for improvement>"
-                }}
-            }},
-            "summary": "<overall summary of the interview performance>"
-        }}"""
-
-        prompt = f"""Interview Transcript:
-        {transcript}"""
-        
-        try:
-            response = openai.chat.completions.create(
-                model="gpt-4.1-mini",
-                messages=[
-                    {"role": "system", "content": sys_prompt},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=4000,
-                temperature=0.1,
-                response_format={"type": "json_object"}
-            )
-            
-            content = response.choices[0].message.content
-            
+    - A `"red_flags"` field to highlight any major concerns such as unethical thinking, communication breakdowns, or critical analytical errors (null if there are none)"""
+
+_PROMPT_PREFIX = "Interview Transcript:\n"
+
+# Two-stage cascade: every transcript is scored by the fast model first and
+# only borderline or flagged results are re-scored by the strong model
+_MODEL_FAST = "gpt-4o-mini"
+_MODEL_STRONG = "gpt-4.1-mini"
+ESCALATE_SCORE_MIN = 5.5
+ESCALATE_SCORE_MAX = 7.5
+_PARSE_ERROR = "Failed to parse AI response"
+
+# The structured analysis fits well under MAX_OUTPUT_TOKENS; a truncated
+# response is retried once with the cap doubled
+MAX_OUTPUT_TOKENS = 1800
+MAX_OUTPUT_TOKENS_CEILING = 2 * MAX_OUTPUT_TOKENS
+
+# Long transcripts keep their head and tail verbatim and have the middle
+# summarized by a cheaper model
+_ENC = tiktoken.encoding_for_model("gpt-4.1-mini")
+COMPACT_THRESHOLD_TOKENS = 12000
+COMPACT_KEEP_TOKENS = 4000
+_SUMMARY_MODEL = "gpt-4o-mini"
+_SUMMARY_PROMPT = """You are summarizing the middle section of a business case interview transcript so it can be evaluated later. Keep every number, calculation, framework, assumption, and recommendation the candidate stated, plus the interviewer's questions and hints, attributed to the right speaker. Drop filler and small talk. Respond with the summary only."""
+_SPEAKER_LINE = re.compile(r'^([A-Za-z][\w ]{0,30}):\s*(.*)$')
+
+# Token budget, checked on the transcript before compaction so oversized
+# inputs never pay for summaries or a round trip that ends in
+# context_length_exceeded
+MAX_TRANSCRIPT_TOKENS = int(os.getenv('MAX_TRANSCRIPT_TOKENS', '500000'))
+MODEL_CONTEXT_TOKENS = {
+    _MODEL_FAST: 128000,
+    _MODEL_STRONG: 1047576,
+    _SUMMARY_MODEL: 128000
+}
+SYS_PROMPT_TOKENS = len(_ENC.encode(_SYS_PROMPT + _PROMPT_PREFIX))
+SUMMARY_PROMPT_TOKENS = len(_ENC.encode(_SUMMARY_PROMPT))
+SUMMARY_MAX_TOKENS = 2000
+# Largest slice of the middle that fits in one summarization request
+SUMMARY_CHUNK_TOKENS = (
+    MODEL_CONTEXT_TOKENS[_SUMMARY_MODEL] - SUMMARY_PROMPT_TOKENS - SUMMARY_MAX_TOKENS - 1000
+)
+
+class TranscriptTooLongError(ValueError):
+    """The transcript is over the token budget; retrying or escalating can't help"""
+
+def _compacted_tokens(transcript_tokens: int) -> int:
+    """Upper bound on the size of a transcript of this length after compaction"""
+    if transcript_tokens <= COMPACT_THRESHOLD_TOKENS:
+        return transcript_tokens
+    middle_tokens = transcript_tokens - 2 * COMPACT_KEEP_TOKENS
+    slices = -(-middle_tokens // SUMMARY_CHUNK_TOKENS)
+    # Plus a little for the summary markers
+    return 2 * COMPACT_KEEP_TOKENS + slices * SUMMARY_MAX_TOKENS + 32
+
+def _check_budget(transcript_tokens: int):
+    if transcript_tokens > MAX_TRANSCRIPT_TOKENS:
+        raise TranscriptTooLongError(
+            f"Transcript has {transcript_tokens} tokens, over the "
+            f"{MAX_TRANSCRIPT_TOKENS}-token limit"
+        )
+    # SYS_PROMPT_TOKENS already covers the user message prefix
+    prompt_tokens = SYS_PROMPT_TOKENS + _compacted_tokens(transcript_tokens)
+    context_tokens = MODEL_CONTEXT_TOKENS[_MODEL_FAST]
+    if prompt_tokens + MAX_OUTPUT_TOKENS_CEILING > context_tokens:
+        raise TranscriptTooLongError(
+            f"Transcript needs {prompt_tokens} prompt tokens, over the "
+            f"{context_tokens}-token context of {_MODEL_FAST}"
+        )
+
+def _summarize(text: str) -> str:
+    response = _create_completion(
+        model=_SUMMARY_MODEL,
+        messages=[
+            {"role": "system", "content": _SUMMARY_PROMPT},
+            {"role": "user", "content": text}
+        ],
+        max_tokens=SUMMARY_MAX_TOKENS,
+        temperature=0
+    )
+    return response.choices[0].message.content
+
+# Compacted transcripts by digest. Retries, escalation and the async and
+# Streamlit paths all rebuild the request, and without this each rebuild
+# would pay for the summaries again and change the prompt text
+_compact_cache = TTLCache(maxsize=256, ttl=3600)
+_compact_cache_lock = threading.Lock()
+
+def _compact(transcript: str) -> str:
+    """
+    Shrink a transcript before sending it to the model, computing it only
+    once per transcript
+    """
+    key = hashlib.blake2b(transcript.encode(), digest_size=16).hexdigest()
+    with _compact_cache_lock:
+        compacted = _compact_cache.get(key)
+    if compacted is None:
+        compacted = _compact_uncached(transcript)
+        with _compact_cache_lock:
+            _compact_cache[key] = compacted
+    return compacted
+
+def _compact_uncached(transcript: str) -> str:
+    """
+    Merge consecutive lines from the same speaker, collapse whitespace and
+    summarize the middle of very long transcripts
+    """
+    lines = []
+    last_speaker = None
+    for raw_line in transcript.splitlines():
+        line = re.sub(r'\s+', ' ', raw_line).strip()
+        if not line:
+            continue
+
+        match = _SPEAKER_LINE.match(line)
+        if match and match.group(1) == last_speaker:
+            lines[-1] += " " + match.group(2)
+            continue
+
+        last_speaker = match.group(1) if match else last_speaker
+        lines.append(line)
+    transcript = "\n".join(lines)
+
+    tokens = _ENC.encode(transcript)
+    _check_budget(len(tokens))
+    if len(tokens) <= COMPACT_THRESHOLD_TOKENS:
+        return transcript
+
+    head = _ENC.decode(tokens[:COMPACT_KEEP_TOKENS])
+    middle = tokens[COMPACT_KEEP_TOKENS:-COMPACT_KEEP_TOKENS]
+    tail = _ENC.decode(tokens[-COMPACT_KEEP_TOKENS:])
+
+    # Very long middles are summarized in slices that fit the summary model
+    summaries = []
+    for i in range(0, len(middle), SUMMARY_CHUNK_TOKENS):
+        slice_tokens = middle[i:i + SUMMARY_CHUNK_TOKENS]
+        _rate_limiter.wait(SUMMARY_PROMPT_TOKENS + len(slice_tokens) + SUMMARY_MAX_TOKENS)
+        summaries.append(_summarize(_ENC.decode(slice_tokens)))
+    summary = "\n".join(summaries)
+
+    return f"{head}\n[... middle summarized ...]\n{summary}\n[... end of summary ...]\n{tail}"
+
+class CompletionStream:
+    """
+    Iterates over the text of a streamed completion; finish_reason is set
+    once the stream is exhausted
+    """
+    def __init__(self, response, on_usage):
+        self._response = response
+        self._on_usage = on_usage
+        self.finish_reason = None
+
+    def __iter__(self) -> Iterator[str]:
+        for chunk in self._response:
+            if chunk.usage:
+                self._on_usage(chunk)
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            if choice.finish_reason:
+                self.finish_reason = choice.finish_reason
+            if choice.delta.content:
+                yield choice.delta.content
+
+def get_transcript_from_vapi(call_id: str) -> str:
+    """
+    Fetch transcript from Vapi using call ID
+    """
+    with _transcript_cache_lock:
+        transcript = _transcript_cache.get(call_id)
+    if transcript is not None:
+        return transcript
+
+    try:
+        call_details = _get_vapi_call(call_id)
+        transcript = call_details.artifact.transcript
+    except Exception as e:
+        raise Exception(f"Failed to fetch transcript from Vapi: {str(e)}")
+
+    # Only cache finished calls - an in-progress transcript is still growing
+    if transcript and getattr(call_details, 'status', None) == 'ended':
+        with _transcript_cache_lock:
+            _transcript_cache[call_id] = transcript
+    return transcript
+
+def _build_messages(transcript: str) -> List[Dict[str, str]]:
+    """
+    Build the chat messages for analyzing a transcript
+    """
+    return [
+        {"role": "system", "content": _SYS_PROMPT},
+        {"role": "user", "content": _PROMPT_PREFIX + _compact(transcript)}
+    ]
+
+def _request_params(transcript: str, strong: bool = False,
+                    max_tokens: int = MAX_OUTPUT_TOKENS) -> Dict[str, Any]:
+    """
+    Chat completion parameters for analyzing a transcript
+    """
+    return {
+        "model": _MODEL_STRONG if strong else _MODEL_FAST,
+        "messages": _build_messages(transcript),
+        "max_tokens": max_tokens,
+        "temperature": 0.1,
+        "response_format": _RESPONSE_FORMAT
+    }
+
+def _log_usage(response):
+    """
+    Log how many prompt tokens were served from OpenAI's prompt cache
+    """
+    usage = response.usage
+    details = getattr(usage, 'prompt_tokens_details', None) if usage else None
+    if details is not None:
+        app.logger.info(
+            "Prompt tokens: %s (cached: %s)",
+            usage.prompt_tokens, details.cached_tokens or 0
+        )
+
+def _parse_response(content: str) -> Dict[str, Any]:
+    """
+    Validate the structured analysis returned by the model
+    """
+    try:
+        analysis_result = InterviewAnalysis.model_validate_json(content).model_dump()
+        return analysis_result
+    except (ValidationError, TypeError):
+        return {
+            "error": _PARSE_ERROR,
+            "raw_response": content
+        }
+
+def get_cached_analysis(transcript: str, strong: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Return a previous analysis of the exact same transcript, if any
+    """
+    model = _MODEL_STRONG if strong else _MODEL_FAST
+    return _get_cached_analysis(_analysis_cache_key(transcript, model))
+
+def store_analysis(transcript: str, content: str, strong: bool = False) -> Dict[str, Any]:
+    """
+    Parse a complete model response and cache it if it is valid
+    """
+    analysis_result = _parse_response(content)
+    if "error" not in analysis_result:
+        model = _MODEL_STRONG if strong else _MODEL_FAST
+        _set_cached_analysis(_analysis_cache_key(transcript, model), analysis_result)
+    return analysis_result
+
+def needs_strong_model(analysis_result: Dict[str, Any]) -> bool:
+    """
+    Whether a fast-model result is borderline, flagged or unparseable and
+    should be re-scored by the strong model. API errors are not escalated:
+    their retries are already exhausted
+    """
+    if "error" in analysis_result:
+        return analysis_result["error"] == _PARSE_ERROR
+    if analysis_result.get("red_flags"):
+        return True
+    score = analysis_result.get("overall_score")
+    return score is not None and ESCALATE_SCORE_MIN <= score <= ESCALATE_SCORE_MAX
+
+def stream_transcript_analysis(transcript: str, strong: bool = False,
+                               max_tokens: int = MAX_OUTPUT_TOKENS) -> CompletionStream:
+    """
+    Stream the raw JSON analysis from OpenAI as it is generated
+    """
+    response = _create_completion(
+        **_request_params(transcript, strong, max_tokens),
+        stream=True,
+        stream_options={"include_usage": True}
+    )
+    return CompletionStream(response, _log_usage)
+
+def _estimate_tokens(transcript: str, max_tokens: int) -> int:
+    """
+    Token cost of one analysis request, for the rate limiter. Counts the
+    compacted transcript that is actually sent; _compact is memoized
+    """
+    return SYS_PROMPT_TOKENS + len(_ENC.encode(_compact(transcript))) + max_tokens
+
+def analyze_transcript(transcript: str, strong: bool = False,
+                       on_progress: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """
+    Analyze interview transcript using OpenAI API. on_progress, if given,
+    receives the text generated so far by the current attempt as it streams
+    """
+    cached_result = get_cached_analysis(transcript, strong)
+    if cached_result is not None:
+        return cached_result
+
+    try:
+        max_tokens = MAX_OUTPUT_TOKENS
+        while True:
+            _rate_limiter.wait(_estimate_tokens(transcript, max_tokens))
+            stream = stream_transcript_analysis(transcript, strong, max_tokens)
+            parts = []
+            for delta in stream:
+                parts.append(delta)
+                if on_progress:
+                    on_progress("".join(parts))
+            content = "".join(parts)
+            if stream.finish_reason != "length" or max_tokens >= MAX_OUTPUT_TOKENS_CEILING:
+                break
+            max_tokens *= 2
+    except TranscriptTooLongError:
+        raise
+    except Exception as e:
+        return {
+            "error": f"OpenAI API error: {str(e)}"
+        }
+
+    return store_analysis(transcript, content, strong)
+
+def _cascade_result(fast_result: Dict[str, Any], strong_result: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+    """Prefer the strong re-score, but keep a valid fast result if it failed"""
+    if "error" in strong_result and "error" not in fast_result:
+        return fast_result, _MODEL_FAST
+    return strong_result, _MODEL_STRONG
+
+def analyze_with_cascade(transcript: str,
+                         on_progress: Optional[Callable[[str], None]] = None) -> Tuple[Dict[str, Any], str]:
+    """
+    Analyze with the fast model, escalating to the strong model when
+    needed. Returns the analysis and the model that produced it
+    """
+    analysis_result = analyze_transcript(transcript, on_progress=on_progress)
+    if not needs_strong_model(analysis_result):
+        return analysis_result, _MODEL_FAST
+    strong_result = analyze_transcript(transcript, strong=True, on_progress=on_progress)
+    return _cascade_result(analysis_result, strong_result)
+
+async def analyze_transcript_async(transcript: str, client: openai.AsyncOpenAI,
+                                   strong: bool = False) -> Dict[str, Any]:
+    """
+    Analyze interview transcript using an async OpenAI client
+    """
+    cached_result = get_cached_analysis(transcript, strong)
+    if cached_result is not None:
+        return cached_result
+
+    try:
+        # Compacting may call OpenAI synchronously, keep it off the event loop
+        request_params = await asyncio.to_thread(_request_params, transcript, strong)
+        await _rate_limiter.acquire(_estimate_tokens(transcript, MAX_OUTPUT_TOKENS))
+        response = await _acreate_completion(client, **request_params)
+        _log_usage(response)
+
+        if response.choices[0].finish_reason == "length":
+            request_params["max_tokens"] = MAX_OUTPUT_TOKENS_CEILING
+            await _rate_limiter.acquire(_estimate_tokens(transcript, MAX_OUTPUT_TOKENS_CEILING))
+            response = await _acreate_completion(client, **request_params)
+            _log_usage(response)
+    except TranscriptTooLongError:
+        raise
+    except Exception as e:
+        return {
+            "error": f"OpenAI API error: {str(e)}"
+        }
+
+    return store_analysis(transcript, response.choices[0].message.content, strong)
+
+async def analyze_many(call_ids: List[str]) -> List[Dict[str, Any]]:
+    """
+    Fetch and analyze several calls concurrently, bounded by the
+    concurrency limit and the shared rate limiter
+    """
+    # Semaphores are bound to an event loop, so this one is per batch;
+    # the process-wide budget is enforced by _rate_limiter
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+    async def analyze_one(call_id: str) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                transcript = await asyncio.to_thread(get_transcript_from_vapi, call_id)
+            except Exception as e:
+                return {"call_id": call_id, "error": str(e)}
+
             try:
-                start_idx = content.find('{')
-                end_idx = content.rfind('}') + 1
-                json_str = content[start_idx:end_idx]
-                analysis_result = json.loads(json_str)
-                return analysis_result
-            except json.JSONDecodeError:
-                return {
-                    "error": "Failed to parse AI response",
-                    "raw_response": content
-                }
-                
-        except Exception as e:
+                analysis_result = await analyze_transcript_async(transcript, client)
+                model_used = _MODEL_FAST
+
+                if needs_strong_model(analysis_result):
+                    strong_result = await analyze_transcript_async(transcript, client, strong=True)
+                    analysis_result, model_used = _cascade_result(analysis_result, strong_result)
+            except TranscriptTooLongError as e:
+                return {"call_id": call_id, "error": str(e)}
+
             return {
-                "error": f"OpenAI API error: {str(e)}"
+                "call_id": call_id,
+                "analysis": analysis_result,
+                "model_used": model_used,
+                "transcript_length": len(transcript)
             }
 
-# Initialize analyzer
-analyzer = InterviewAnalyzer()
+    # The async client's connection pool is bound to the running event loop,
+    # so open one per batch rather than sharing it across asyncio.run calls
+    async with openai.AsyncOpenAI(api_key=openai.api_key, max_retries=0) as client:
+        return await asyncio.gather(*[analyze_one(call_id) for call_id in call_ids])
+
+def _running_under_gevent() -> bool:
+    """True when gevent has patched the socket module (USE_GEVENT or a gevent worker)"""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('socket')
+
+def _analyze_call(call_id: str) -> Dict[str, Any]:
+    try:
+        transcript = get_transcript_from_vapi(call_id)
+        analysis_result, model_used = analyze_with_cascade(transcript)
+    except Exception as e:
+        return {"call_id": call_id, "error": str(e)}
+    return {
+        "call_id": call_id,
+        "analysis": analysis_result,
+        "model_used": model_used,
+        "transcript_length": len(transcript)
+    }
+
+def analyze_many_gevent(call_ids: List[str]) -> List[Dict[str, Any]]:
+    """
+    gevent counterpart of analyze_many. asyncio tracks its running loop per
+    OS thread, not per greenlet, so a second asyncio.run in the same gevent
+    worker fails; here the sync path runs in a greenlet pool instead
+    """
+    from gevent.pool import Pool
+    return Pool(MAX_CONCURRENT_REQUESTS).map(_analyze_call, call_ids)
+
+def _warm():
+    """
+    Open the pooled OpenAI connection (TCP+TLS) ahead of the first real
+    request; called from gunicorn's post_worker_init hook
+    """
+    try:
+        # Short timeout so an unreachable API can't stall worker startup;
+        # the copy shares openai_client's connection pool
+        openai_client.with_options(timeout=5).models.list()
+    except Exception as e:
+        app.logger.warning("OpenAI connection warmup failed: %s", e)
 
 @app.route('/analyze-call/<call_id>', methods=['GET'])
 def analyze_by_call_id(call_id: str):
@@ -152,28 +726,104 @@ def analyze_by_call_id(call_id: str):
     Convenient GET endpoint to analyze by call ID directly
     """
     try:
-        transcript = analyzer.get_transcript_from_vapi(call_id)
-        analysis_result = analyzer.analyze_transcript(transcript)
+        transcript = get_transcript_from_vapi(call_id)
+        analysis_result, model_used = analyze_with_cascade(transcript)
         
         return jsonify({
             "success": True,
             "call_id": call_id,
             "analysis": analysis_result,
+            "model_used": model_used,
             "transcript_length": len(transcript)
         })
         
+    except TranscriptTooLongError as e:
+        return jsonify({
+            "error": f"Error analyzing call {call_id}: {str(e)}"
+        }), 413
+
     except Exception as e:
         return jsonify({
             "error": f"Error analyzing call {call_id}: {str(e)}"
         }), 500
 
+@app.route('/analyze-batch', methods=['POST'])
+def analyze_batch():
+    """
+    Analyze several calls. Body: a JSON list of call IDs or
+    {"call_ids": [...], "offline": true}. Offline requests are submitted
+    to the OpenAI Batch API and return a batch ID to poll
+    """
+    data = request.get_json(silent=True)
+    call_ids = data.get('call_ids') if isinstance(data, dict) else data
+    offline = isinstance(data, dict) and bool(data.get('offline'))
+
+    if not isinstance(call_ids, list) or not call_ids:
+        return jsonify({"error": "Request body must contain a non-empty list of call IDs"}), 400
+
+    try:
+        if offline:
+            transcripts = {call_id: get_transcript_from_vapi(call_id) for call_id in call_ids}
+            # Batch jobs are already discounted and cannot be escalated or
+            # retried, so they go straight to the strong model with the full cap
+            batch_id = batch_jobs.submit_batch(
+                openai_client,
+                transcripts,
+                partial(_request_params, strong=True, max_tokens=MAX_OUTPUT_TOKENS_CEILING)
+            )
+
+            return jsonify({
+                "success": True,
+                "batch_id": batch_id,
+                "status_url": f"/analyze-batch/{batch_id}"
+            }), 202
+
+        if _running_under_gevent():
+            results = analyze_many_gevent(call_ids)
+        else:
+            results = asyncio.run(analyze_many(call_ids))
+
+        return jsonify({
+            "success": True,
+            "results": results
+        })
+
+    except TranscriptTooLongError as e:
+        return jsonify({
+            "error": f"Error analyzing calls: {str(e)}"
+        }), 413
+
+    except Exception as e:
+        return jsonify({
+            "error": f"Error analyzing calls: {str(e)}"
+        }), 500
+
+@app.route('/analyze-batch/<batch_id>', methods=['GET'])
+def get_batch_results(batch_id: str):
+    """
+    Endpoint to check an offline batch and fetch its results once completed
+    """
+    try:
+        batch_result = batch_jobs.fetch_results(openai_client, batch_id, _parse_response)
+
+        return jsonify({
+            "success": True,
+            "model_used": _MODEL_STRONG,
+            **batch_result
+        })
+
+    except Exception as e:
+        return jsonify({
+            "error": f"Error fetching batch {batch_id}: {str(e)}"
+        }), 500
+
 @app.route('/get-transcript/<call_id>', methods=['GET'])
 def get_transcript_only(call_id: str):
     """
     Endpoint to just fetch transcript without analysis
     """
     try:
-        transcript = analyzer.get_transcript_from_vapi(call_id)
+        transcript = get_transcript_from_vapi(call_id)
         
         return jsonify({
             "success": True,
@@ -199,6 +849,8 @@ def home():
         "message": "Interview Transcript Analysis API",
         "endpoints": {
             "/analyze-call/<call_id>": "GET - Analyze by call ID directly",
+            "/analyze-batch": "POST - Analyze a list of call IDs concurrently, or offline via the Batch API",
+            "/analyze-batch/<batch_id>": "GET - Status and results of an offline batch",
             "/get-transcript/<call_id>": "GET - Get transcript only",
             "/health": "GET - Health check"
         },
@@ -226,12 +878,12 @@ def analyze_call_directly(call_id: str = "39721b13-a0ef-48a8-baa0-d7c5a96d08c5")
     Direct function to analyze a call - useful for testing
     """
     try:
-        transcript = analyzer.get_transcript_from_vapi(call_id)
+        transcript = get_transcript_from_vapi(call_id)
         print(f"Transcript fetched (length: {len(transcript)} characters)")
         print("-" * 50)
         
-        analysis = analyzer.analyze_transcript(transcript)
-        print("Analysis completed!")
+        analysis, model_used = analyze_with_cascade(transcript)
+        print(f"Analysis completed with {model_used}!")
         print(json.dumps(analysis, indent=2))
         return analysis
         
@@ -240,4 +892,6 @@ def analyze_call_directly(call_id: str = "39721b13-a0ef-48a8-baa0-d7c5a96d08c5")
         return None
 
 if __name__ == "__main__":
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # Development server only - in production run under gunicorn:
+    #   gunicorn -c gunicorn.conf.py app:app
+    app.run(debug=os.getenv('FLASK_DEBUG') == '1', host='0.0.0.0', port=5000)
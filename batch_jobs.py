@@ -0,0 +1,74 @@
+# batch_jobs.py
+import openai
+import os
+import json
+import tempfile
+from typing import Dict, Any, Callable
+
+# Batch statuses after which the batch will not change anymore
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+def submit_batch(client: openai.OpenAI, transcripts: Dict[str, str],
+                 build_request: Callable[[str], Dict[str, Any]]) -> str:
+    """
+    Submit transcripts (keyed by call ID) to the OpenAI Batch API and
+    return the batch ID
+    """
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.jsonl', dir='/tmp', delete=False) as f:
+        for call_id, transcript in transcripts.items():
+            f.write(json.dumps({
+                "custom_id": call_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": build_request(transcript)
+            }) + "\n")
+        jsonl_path = f.name
+
+    try:
+        with open(jsonl_path, 'rb') as f:
+            batch_file = client.files.create(file=f, purpose="batch")
+    finally:
+        os.remove(jsonl_path)
+
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    return batch.id
+
+def _read_jsonl(client: openai.OpenAI, file_id: str):
+    content = client.files.content(file_id)
+    for line in content.text.splitlines():
+        if line.strip():
+            yield json.loads(line)
+
+def fetch_results(client: openai.OpenAI, batch_id: str,
+                  parse_response: Callable[[str], Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Check a batch and, once it reaches a terminal status, parse each output
+    line into the same shape analyze_transcript returns. Expired and
+    cancelled batches still carry the requests that finished in time
+    """
+    batch = client.batches.retrieve(batch_id)
+    if batch.status not in TERMINAL_STATUSES:
+        return {"batch_id": batch_id, "status": batch.status}
+
+    results = {}
+    if batch.output_file_id:
+        for record in _read_jsonl(client, batch.output_file_id):
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code") != 200:
+                results[record["custom_id"]] = {
+                    "error": f"OpenAI API error: {record.get('error') or response.get('body')}"
+                }
+            else:
+                content = response["body"]["choices"][0]["message"]["content"]
+                results[record["custom_id"]] = parse_response(content)
+
+    if batch.error_file_id:
+        for record in _read_jsonl(client, batch.error_file_id):
+            error = record.get("error") or (record.get("response") or {}).get("body")
+            results[record["custom_id"]] = {"error": f"OpenAI API error: {error}"}
+
+    return {"batch_id": batch_id, "status": batch.status, "results": results}
@@ -0,0 +1,19 @@
+# gunicorn.conf.py
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+
+# gevent workers multiplex many in-flight OpenAI/Vapi requests per process.
+# /analyze-batch uses a gevent pool instead of asyncio under these workers
+worker_class = 'gevent'
+workers = int(os.getenv('GUNICORN_WORKERS', '4'))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))
+
+# Analysis requests can take a while on long transcripts
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+
+def post_worker_init(worker):
+    # Importing app loads the tokenizer; _warm opens the OpenAI connection
+    # so the first request after a deploy does not pay for the handshake
+    from app import _warm
+    _warm()
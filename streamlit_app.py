@@ -4,16 +4,19 @@ from vapi import Vapi
 import os
 from dotenv import load_dotenv
 import time
-from app import InterviewAnalyzer  # This will be your existing analyzer class
+from app import get_transcript_from_vapi, analyze_with_cascade
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Vapi client
-vapi_client = Vapi(token=os.getenv('VAPI_TOKEN'))
+# Paging used when looking up the latest completed call
+CALLS_PAGE_SIZE = 20
+MAX_CALL_PAGES = 50
 
-# Initialize analyzer
-analyzer = InterviewAnalyzer()
+# Streamlit reruns this script on every interaction, so build the client once
+@st.cache_resource
+def get_vapi():
+    return Vapi(token=os.getenv('VAPI_TOKEN'))
 
 def start_call():
     """Start a new call using Vapi"""
@@ -40,7 +43,7 @@ def start_call():
             }
         }
         
-        call = vapi_client.call.start(call_params)
+        call = get_vapi().call.start(call_params)
         st.session_state.current_call_id = call.id
         st.success(f"Call started with ID: {call.id}")
         return call
@@ -51,31 +54,60 @@ def start_call():
 def end_call(call_id):
     """End an ongoing call"""
     try:
-        vapi_client.call.end(call_id)
+        get_vapi().call.end(call_id)
         st.session_state.call_ended = True
+        # The call just ended, so the cached "latest completed call" is stale
+        fetch_latest_completed_call_id.clear()
         st.success(f"Call {call_id} ended successfully")
         return True
     except Exception as e:
         st.error(f"Failed to end call: {str(e)}")
         return False
 
+@st.cache_data(ttl=30)
+def fetch_latest_completed_call_id():
+    """ID of the most recent completed call, cached briefly across reruns"""
+    # Vapi can't filter calls by status, so walk back from the newest calls in
+    # small pages and stop at the first page that has an ended call
+    created_before = None
+    for _ in range(MAX_CALL_PAGES):
+        calls = get_vapi().calls.list(limit=CALLS_PAGE_SIZE, created_at_lt=created_before)
+        completed_calls = [call for call in calls if hasattr(call, 'status') and call.status == 'ended']
+
+        if completed_calls:
+            latest_call = max(completed_calls, key=lambda x: x.created_at)
+            return latest_call.id
+
+        if len(calls) < CALLS_PAGE_SIZE:
+            return None
+        created_before = min(call.created_at for call in calls)
+
+    return None
+
 def get_latest_completed_call():
     """Fetch the most recent completed call"""
     try:
-        calls = vapi_client.calls.list()
-        completed_calls = [call for call in calls if hasattr(call, 'status') and call.status == 'ended']
-        
-        if not completed_calls:
+        call_id = fetch_latest_completed_call_id()
+        if not call_id:
+            # Don't keep a miss around - the call may end within the TTL
+            fetch_latest_completed_call_id.clear()
             st.warning("No completed calls found")
-            return None
-            
-        latest_call = max(completed_calls, key=lambda x: x.created_at)
-        return latest_call.id
+        return call_id
         
     except Exception as e:
         st.error(f"Error fetching calls: {e}")
         return None
 
+def analyze_with_progress(transcript):
+    """Show the model output on the page while the analysis is generated"""
+    progress = st.empty()
+    analysis, _ = analyze_with_cascade(transcript, on_progress=progress.code)
+    progress.empty()
+
+    if "error" in analysis:
+        raise Exception(analysis["error"])
+    return analysis
+
 def main():
     st.title("Interview Analysis Dashboard")
     
@@ -108,8 +140,8 @@ def main():
             st.session_state.analyze_call_id = call_id
             with st.spinner("Analyzing call..."):
                 try:
-                    transcript = analyzer.get_transcript_from_vapi(call_id)
-                    analysis = analyzer.analyze_transcript(transcript)
+                    transcript = get_transcript_from_vapi(call_id)
+                    analysis = analyze_with_progress(transcript)
                     
                     st.session_state.transcript = transcript
                     st.session_state.analysis = analysis
@@ -126,8 +158,8 @@ def main():
                 st.session_state.analyze_call_id = call_id_input
                 with st.spinner("Analyzing call..."):
                     try:
-                        transcript = analyzer.get_transcript_from_vapi(call_id_input)
-                        analysis = analyzer.analyze_transcript(transcript)
+                        transcript = get_transcript_from_vapi(call_id_input)
+                        analysis = analyze_with_progress(transcript)
                         
                         st.session_state.transcript = transcript
                         st.session_state.analysis = analysis